@@ -30,11 +30,14 @@ from .utils import StreamPorts, OutletPort, colors
 from .process_tools import utils
 # from .utils import NotImplementedMethod
 from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
 from warnings import warn
 from inspect import signature
 from thermosteam.utils import repr_kwargs
 import biosteam as bst
 import numpy as np
+from numba import njit
 from scipy.integrate import solve_ivp, odeint
 
 __all__ = ('System', 'AgileSystem', 'MockSystem',
@@ -97,10 +100,124 @@ def converge_system_in_path(system):
         method = system._converge
     try_method_with_object_stamp(system, method)
 
+def converge_systems_in_parallel(systems, executor):
+    futures = [executor.submit(converge_system_in_path, i) for i in systems]
+    wait(futures)
+    for i in futures: i.result() # Raise exceptions only after all systems are done
+
+def is_isolated_system(system):
+    """
+    Return whether the system only reads and writes its own streams when
+    converged (i.e., no specifications or functions in its path).
+    """
+    if system._specification: return False
+    isa = isinstance
+    for i in system._path:
+        if isa(i, Unit):
+            if i._specification: return False
+        elif isa(i, System):
+            if not is_isolated_system(i): return False
+        else:
+            return False # Functions may access any stream
+    return True
+
 def simulate_unit_in_path(unit):
     try_method_with_object_stamp(unit, unit.simulate)
 
 
+# %% Recycle convergence utilities
+
+@njit(cache=True)
+def compute_molar_errors(mol, mol_new):
+    """Return the absolute and relative molar flow rate errors of a recycle iteration."""
+    mol_errors = np.abs(mol - mol_new)
+    positive_index = mol_errors > 1e-16
+    mol_errors = mol_errors[positive_index]
+    if mol_errors.size == 0: return 0., 0.
+    mol_error = mol_errors.max()
+    if mol_error > 1e-12:
+        mol = np.abs(mol[positive_index])
+        mol_new = np.abs(mol_new[positive_index])
+        rmol_error = (mol_errors / np.maximum(mol, mol_new)).max()
+    else:
+        rmol_error = 0.
+    return mol_error, rmol_error
+
+@njit(cache=True)
+def quasi_newton_iter(x, dx, g1, g0, damping, max_acceleration):
+    """
+    Return the next iteration of a damped quasi-Newton method where the 
+    Jacobian is approximated by its diagonal (i.e. the slope of the 
+    fixed-point function with respect to each component). Components with 
+    a slope of at least 1 are updated by direct substitution. The 
+    acceleration, 1 / (1 - slope), is capped at `max_acceleration` so that 
+    noisy slope estimates near 1 cannot produce arbitrarily large steps.
+    
+    """
+    x_new = g1.copy()
+    for i in np.ndindex(x.shape):
+        dxi = dx[i]
+        if np.abs(dxi) > 1e-16:
+            slope = (g1[i] - g0[i]) / dxi
+            if slope < 1.: 
+                acceleration = min(1. / (1. - slope), max_acceleration)
+                x_new[i] = x[i] + damping * acceleration * (g1[i] - x[i])
+    return x_new
+
+def conditional_quasi_newton(f, x, damping=1., max_acceleration=10.):
+    """Conditional iterative quasi-Newton solver."""
+    x0 = x
+    g0, condition = f(x0)
+    x1 = g0
+    while condition:
+        g1, condition = f(x1)
+        dx = x1 - x0
+        x0 = x1
+        x1 = quasi_newton_iter(x1, dx, g1, g0, damping, max_acceleration)
+        g0 = g1
+    return x1
+
+def conditional_anderson(f, x, m=5, damping=0.5):
+    """
+    Conditional iterative Anderson solver. The last `m` iterations are used 
+    to extrapolate the next iteration. Iterations are damped when the residual 
+    grows (i.e. the fixed-point function is not contractive).
+    
+    """
+    shape = x.shape
+    xs = []
+    gs = []
+    residual_last = None
+    lstsq = np.linalg.lstsq
+    condition = True
+    while condition:
+        g, condition = f(x)
+        if not condition: break
+        x = x.flatten()
+        g = g.flatten()
+        xs.append(x)
+        gs.append(g)
+        if len(xs) > m + 1:
+            del xs[0], gs[0]
+        residual = g - x
+        residual_norm = np.abs(residual).max()
+        if residual_last is not None and residual_norm > residual_last:
+            beta = damping
+        else:
+            beta = 1.
+        residual_last = residual_norm
+        if len(xs) > 1:
+            X = np.array(xs)
+            G = np.array(gs)
+            dX = np.diff(X, axis=0).T
+            dG = np.diff(G, axis=0).T
+            gamma = lstsq(dG - dX, residual, rcond=None)[0]
+            x = x - dX @ gamma
+            g = g - dG @ gamma
+        x = ((1. - beta) * x + beta * g).reshape(shape)
+    return x
+
+
 # %% Debugging and exception handling
 
 def raise_recycle_type_error(recycle):
@@ -321,11 +438,15 @@ class System:
         '_connections',
         '_irrelevant_units',
         '_converge_method',
+        'converge_options',
         '_TEA',
         '_LCA',
         '_subsystems',
         '_units',
         '_unit_path',
+        '_parallel_path',
+        '_parallel_executor',
+        'parallel_subsystems',
         '_cost_units',
         '_streams',
         '_feeds',
@@ -362,6 +483,10 @@ class System:
     #: [bool] Whether to raise a RuntimeError when system doesn't converge
     strict_convergence = True
 
+    #: [bool] Default whether to converge adjacent subsystems that share no 
+    #: streams concurrently (in separate threads).
+    default_parallel_subsystems = False
+
     @classmethod
     def from_feedstock(cls, ID, feedstock, feeds=None, facilities=(),
                        ends=None, facility_recycle=None, operating_hours=None,
@@ -641,7 +766,7 @@ class System:
                 mixer_thermo[mixer] = thermo_cache[IDs] = unit.thermo.subset(chemicals)
 
     def _delete_path_cache(self):
-        for i in ('_units', '_unit_path', '_streams'):
+        for i in ('_units', '_unit_path', '_streams', '_parallel_path'):
             if hasattr(self, i): delattr(self, i)
         for i in self.subsystems: i._delete_path_cache()
 
@@ -731,6 +856,15 @@ class System:
         #: [str] Converge method
         self.converge_method = self.default_converge_method
 
+        #: [dict[str, dict]] Keyword arguments passed to the solver by 
+        #: convergence method (e.g., {'anderson': {'m': 3, 'damping': 0.8}})
+        self.converge_options = {}
+
+        #: [bool] Whether to converge adjacent subsystems that share no streams
+        #: concurrently (in separate threads). A thread pool, sized for the 
+        #: largest group, is kept and reused across iterations.
+        self.parallel_subsystems = self.default_parallel_subsystems
+
         self.use_stabilized_convergence_algorithm = self.default_stabilized_convergence
 
     @property
@@ -984,6 +1118,64 @@ class System:
             self._subsystems = [i for i in self._path if isinstance(i, System)]
             return self._subsystems
 
+    @property
+    def parallel_path(self):
+        """
+        tuple[Unit, function, System and/or tuple[System]] Path where adjacent 
+        subsystems that share no streams are grouped together so that they can 
+        be converged concurrently. Subsystems with specifications (including
+        unit specifications) or functions in their path are never grouped, as 
+        these may access any stream. The parallel path is cached and refreshed 
+        at the start of each simulation.
+        
+        """
+        path = self._path
+        try:
+            cached_path, parallel_path = self._parallel_path
+            if cached_path is path: return parallel_path
+        except:
+            pass
+        isa = isinstance
+        parallel_path = []
+        group = []
+        group_streams = set()
+        def add_group():
+            if len(group) > 1:
+                parallel_path.append(tuple(group))
+            else:
+                parallel_path.extend(group)
+            group.clear()
+            group_streams.clear()
+        for i in path:
+            if isa(i, System) and is_isolated_system(i):
+                streams = i.streams
+                if not group_streams.isdisjoint(streams): add_group()
+                group.append(i)
+                group_streams.update(streams)
+            else:
+                add_group()
+                parallel_path.append(i)
+        add_group()
+        parallel_path = tuple(parallel_path)
+        self._parallel_path = (path, parallel_path)
+        return parallel_path
+    
+    def _reset_parallel_path(self):
+        if hasattr(self, '_parallel_path'): del self._parallel_path
+        for i in self.subsystems: i._reset_parallel_path()
+    
+    def _get_parallel_executor(self, parallel_path):
+        try:
+            cached_path, executor = self._parallel_executor
+            if cached_path is parallel_path: return executor
+            if executor: executor.shutdown(wait=False)
+        except AttributeError:
+            pass
+        max_workers = max([len(i) for i in parallel_path if isinstance(i, tuple)], default=0)
+        executor = ThreadPoolExecutor(max_workers) if max_workers else None
+        self._parallel_executor = (parallel_path, executor)
+        return executor
+
     @property
     def units(self):
         """[list] All unit operations as ordered in the path without repetitions."""
@@ -1110,15 +1302,15 @@ class System:
 
     @property
     def converge_method(self):
-        """Iterative convergence method ('wegstein', 'aitken', or 'fixedpoint')."""
+        """Iterative convergence method ('wegstein', 'aitken', 'anderson', 'quasinewton', or 'fixedpoint')."""
         return self._converge_method.__name__[1:]
     @converge_method.setter
     def converge_method(self, method):
-        method = method.lower().replace('-', '').replace(' ', '')
+        method = method.lower().replace('-', '').replace('_', '').replace(' ', '')
         try:
             self._converge_method = getattr(self, '_' + method)
         except:
-            raise ValueError("only 'wegstein', 'aitken', and 'fixedpoint' "
+            raise ValueError("only 'wegstein', 'aitken', 'anderson', 'quasinewton', and 'fixedpoint' "
                             f"methods are valid, not '{method}'")
 
     @property
@@ -1264,18 +1456,9 @@ class System:
         self._run()
         mol_new = self._get_recycle_data()
         T_new = self._get_recycle_temperatures()
-        mol_errors = np.abs(mol - mol_new)
-        positive_index = mol_errors > 1e-16
-        mol_errors = mol_errors[positive_index]
-        if mol_errors.size == 0:
-            self._mol_error = mol_error = 0.
-            self._rmol_error = rmol_error = 0.
-        else:
-            self._mol_error = mol_error = mol_errors.max()
-            if mol_error > 1e-12:
-                self._rmol_error = rmol_error = (mol_errors / np.maximum.reduce([np.abs(mol[positive_index]), np.abs(mol_new[positive_index])])).max()
-            else:
-                self._rmol_error = rmol_error = 0.
+        mol_error, rmol_error = compute_molar_errors(mol.ravel(), mol_new.ravel())
+        self._mol_error = mol_error
+        self._rmol_error = rmol_error
         T_errors = np.abs(T - T_new)
         self._T_error = T_error = T_errors.max()
         self._rT_error = rT_error = (T_errors / T).max()
@@ -1344,6 +1527,7 @@ class System:
         """Setup each element of the system."""
         self._load_facilities()
         self._load_configuration()
+        self._reset_parallel_path()
         for i in self.units: i._setup()
 
     def _run(self):
@@ -1351,9 +1535,15 @@ class System:
         isa = isinstance
         converge = converge_system_in_path
         run = try_method_with_object_stamp
-        for i in self._path:
+        if self.parallel_subsystems:
+            path = self.parallel_path
+            executor = self._get_parallel_executor(path)
+        else:
+            path = self._path
+        for i in path:
             if isa(i, Unit): run(i, i.run)
             elif isa(i, System): converge(i)
+            elif isa(i, tuple): converge_systems_in_parallel(i, executor)
             else: i() # Assume it's a function
 
     # Methods for convering the recycle stream
@@ -1369,8 +1559,18 @@ class System:
         """Converge the system recycle iteratively using Aitken's method."""
         self._solve(flx.conditional_aitken)
 
+    def _anderson(self):
+        """Converge the system recycle iteratively using Anderson acceleration."""
+        self._solve(conditional_anderson)
+
+    def _quasinewton(self):
+        """Converge the system recycle iteratively using a diagonal quasi-Newton method."""
+        self._solve(conditional_quasi_newton)
+
     def _solve(self, solver):
         """Solve the system recycle iteratively using given solver."""
+        options = self.converge_options.get(self.converge_method)
+        if options: solver = partial(solver, **options)
         self._reset_iter()
         f = iter_run = self._iter_run
         if self._stabilized:
@@ -1471,6 +1671,36 @@ class System:
         for system in self.subsystems:
             system.empty_recycles()
 
+    def warm_start(self, state):
+        """
+        Set recycle streams to a previously converged state so that the next
+        simulation starts near the solution.
+
+        Parameters
+        ----------
+        state : dict[Stream, Iterable[float]]
+            Molar flow rates [kmol/hr] by recycle stream. For a MultiStream,
+            flow rates must be given by phase (one row per phase).
+
+        """
+        recycle = self._recycle
+        isa = isinstance
+        if isa(recycle, Stream): recycles = (recycle,)
+        elif isa(recycle, Iterable): recycles = recycle
+        else: recycles = ()
+        for stream, mol in state.items():
+            if stream not in recycles:
+                raise ValueError(f'{stream} is not a recycle stream of {repr(self)}')
+            if isa(stream, MultiStream):
+                N_rows = len(stream)
+                M_rows = np.shape(mol)[0] if np.ndim(mol) == 2 else 1
+                if N_rows != M_rows:
+                    raise IndexError(f'expected {N_rows} rows; got {M_rows} rows instead')
+        self._reset_errors()
+        for stream, mol in state.items():
+            if isa(stream, MultiStream): stream._imol._data[:] = mol
+            else: stream.mol[:] = mol
+
     def _init_dynamic(self):
         '''Initialize attributes related to dynamic simulation.'''
         self._state = None
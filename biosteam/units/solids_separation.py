@@ -36,6 +36,8 @@ __all__ = ('SolidsSeparator', 'RotaryVacuumFilter', 'CrushingMill',
            'PressureFilter', 'SolidsCentrifuge', 'RVF',
            'ScrewPress',)
 
+_kg2ton = 0.0011023 # kg to short tons (2000 lbs)
+
 class SolidsSeparator(Splitter):
     """
     Create SolidsSeparator object.
@@ -139,8 +141,7 @@ class SolidsCentrifuge(SolidsSeparator):
 
     def _design(self):
         solids, centrifuge_type = self._solids, self.centrifuge_type
-        ts = sum([s.imass[solids].sum() for s in self.ins if not s.isempty()]) # Total solids
-        ts *= 0.0011023 # To short tons (2000 lbs/hr)
+        ts = _kg2ton * sum([s.imass[solids].sum() for s in self.ins if not s.isempty()]) # Total solids [ton/hr]
         self.design_results['Solids loading'] = ts
         lb, ub = self.solids_loading_range[centrifuge_type]
         if ts < lb:
@@ -11,6 +11,7 @@ import pytest
 import numpy as np
 import biosteam as bst
 from biosteam._network import Network
+from biosteam._system import quasi_newton_iter
 from numpy.testing import assert_allclose
 from biosteam import (
     main_flowsheet as f,
@@ -18,9 +19,12 @@ from biosteam import (
     Stream, settings, System
 )
 
+@pytest.fixture(scope='module', autouse=True)
+def water_thermo():
+    settings.set_thermo(['Water'], cache=True)
+
 def test_trivial_case():
     f.set_flowsheet('trivial_case')
-    settings.set_thermo(['Water'], cache=True)
     trivial_sys_a = f.create_system('trivial_sys_a')
     network_a = trivial_sys_a.to_network()
     Stream('feedstock', Water=1000)
@@ -39,7 +43,6 @@ def test_trivial_case():
 
 def test_linear_case():
     f.set_flowsheet('linear_case')
-    settings.set_thermo(['Water'], cache=True)
     feedstock = Stream('feedstock', Water=1000)
     water = Stream('water', Water=10)
     byproduct = Stream('byproduct')
@@ -61,7 +64,6 @@ def test_linear_case():
 
 def test_simple_recycle_loop():
     f.set_flowsheet('simple_recycle_loop')
-    settings.set_thermo(['Water'], cache=True)
     feedstock = Stream('feedstock', Water=1000)
     water = Stream('water', Water=10)
     recycle = Stream('recycle')
@@ -81,13 +83,40 @@ def test_simple_recycle_loop():
     assert recycle_loop_sys.path == (M1, S1)
     recycle_loop_sys.empty_recycles()
     recycle_loop_sys.simulate()
+    cold_iterations = recycle_loop_sys._iter
     x_flat_solution = recycle.mol.copy()
     assert_allclose(x_nested_solution, x_flat_solution, rtol=1e-2)
+    recycle_loop_sys.empty_recycles()
+    recycle_loop_sys.warm_start({recycle: x_flat_solution})
+    assert_allclose(recycle.mol, x_flat_solution)
+    recycle_loop_sys.simulate()
+    assert recycle_loop_sys._iter < cold_iterations
+    assert_allclose(recycle.mol, x_flat_solution, rtol=1e-2)
+    with pytest.raises(ValueError):
+        recycle_loop_sys.warm_start({product: x_flat_solution})
+    recycle_loop_sys.converge_method = 'Anderson'
+    recycle_loop_sys.converge_options['anderson'] = {'invalid_option': None}
+    with pytest.raises(TypeError):
+        recycle_loop_sys.simulate()
+    recycle.phases = ('g', 'l')
+    with pytest.raises(IndexError):
+        recycle_loop_sys.warm_start({recycle: x_flat_solution})
+    recycle_loop_sys.warm_start({recycle: [0.5 * x_flat_solution, 0.5 * x_flat_solution]})
+    assert_allclose(recycle.mol, x_flat_solution)
     f.clear()
 
+def test_quasi_newton_iter():
+    x = np.ones(4)
+    dx = np.array([1., 1., 1., 0.])
+    g0 = np.zeros(4)
+    # Slopes: 0.5 (accelerated), 2 (direct substitution), 
+    # 0.95 (acceleration capped), and unknown (direct substitution)
+    g1 = np.array([0.5, 2., 0.95, 3.])
+    assert_allclose(quasi_newton_iter(x, dx, g1, g0, 1., 10.), [0., 2., 0.5, 3.])
+    assert_allclose(quasi_newton_iter(x, dx, g1, g0, 0.5, 10.), [0.5, 2., 0.75, 3.])
+
 def test_unconnected_case():
     f.set_flowsheet('unconnected_case')
-    settings.set_thermo(['Water'], cache=True)
     feedstock_a = Stream('feedstock_a', Water=1000)
     water_a = Stream('water_a', Water=10)
     byproduct_a = Stream('byproduct_a')
@@ -118,7 +147,6 @@ def test_unconnected_case():
 
 def test_unconnected_recycle_loop():
     f.set_flowsheet('unconnected_recycle_loop')
-    settings.set_thermo(['Water'], cache=True)
     feedstock_a = Stream('feedstock_a', Water=1000)
     water_a = Stream('water_a', Water=10)
     recycle_a = Stream('recycle_a')
@@ -175,7 +203,6 @@ def test_unconnected_recycle_loop():
 
 def test_unconnected_recycle_loops():
     f.set_flowsheet('unconnected_recycle_loops')
-    settings.set_thermo(['Water'], cache=True)
     feedstock_a = Stream('feedstock_a', Water=1000)
     water_a = Stream('water_a', Water=10)
     recycle_a = Stream('recycle_a')
@@ -201,8 +228,28 @@ def test_unconnected_recycle_loops():
              S1_b],
             recycle=S1_b-1)])
     assert network == actual_network
+    sys_a, sys_b = recycle_loop_sys.subsystems
+    assert recycle_loop_sys.parallel_path == ((sys_a, sys_b),)
     recycle_loop_sys.simulate()
     x_nested_solution = np.vstack([recycle_a.mol, recycle_b.mol])
+    recycle_loop_sys.parallel_subsystems = True
+    recycle_loop_sys.empty_recycles()
+    recycle_loop_sys.simulate()
+    x_parallel_solution = np.vstack([recycle_a.mol, recycle_b.mol])
+    assert_allclose(x_nested_solution, x_parallel_solution, rtol=1e-2)
+    M1_b.add_specification(M1_b._run)
+    recycle_loop_sys.simulate()
+    assert recycle_loop_sys.parallel_path == (sys_a, sys_b)
+    M1_b.specification.clear()
+    recycle_loop_sys.simulate()
+    assert recycle_loop_sys.parallel_path == ((sys_a, sys_b),)
+    sys_b.maxiter = 1
+    recycle_loop_sys.empty_recycles()
+    with pytest.raises(RuntimeError):
+        recycle_loop_sys.simulate()
+    assert_allclose(recycle_a.mol, x_nested_solution[0], rtol=1e-2)
+    sys_b.maxiter = sys_b.default_maxiter
+    recycle_loop_sys.parallel_subsystems = False
     recycle_loop_sys.flatten()
     assert recycle_loop_sys.path == (M1_a, S1_a, M1_b, S1_b)
     recycle_loop_sys.empty_recycles()
@@ -210,10 +257,9 @@ def test_unconnected_recycle_loops():
     x_flat_solution = np.vstack([recycle_a.mol, recycle_b.mol])
     assert_allclose(x_nested_solution, x_flat_solution, rtol=1e-2)
     f.clear()
-    
+
 def test_inner_recycle_loop():
     f.set_flowsheet('simple_recycle_loop')
-    settings.set_thermo(['Water'], cache=True)
     feedstock = Stream('feedstock', Water=1000)
     water = Stream('water', Water=10)
     recycle = Stream('recycle')
@@ -244,7 +290,6 @@ def test_inner_recycle_loop():
     
 def test_inner_recycle_loop_with_bifurcated_feed():
     f.set_flowsheet('simple_recycle_loop_with_bifurcated_feed')
-    settings.set_thermo(['Water'], cache=True)
     feedstock = Stream('feedstock', Water=1000)
     water = Stream('water', Water=10)
     recycle = Stream('recycle')
@@ -282,7 +327,6 @@ def test_inner_recycle_loop_with_bifurcated_feed():
 
 def test_bifurcated_recycle_loops():
     f.set_flowsheet('bifurcated_recycle_loops')
-    settings.set_thermo(['Water'], cache=True)
     feed_a = Stream('feed_a', Water=10)
     water_a = Stream('water_a', Water=10)
     recycle_a = Stream('recycle_a')
@@ -340,7 +384,6 @@ def test_bifurcated_recycle_loops():
 
 def test_two_recycle_loops_with_complete_overlap():
     f.set_flowsheet('two_recycle_loops_with_complete_overlap')
-    settings.set_thermo(['Water'], cache=True)
     feedstock = Stream('feedstock', Water=1000)
     water = Stream('water', Water=10)
     recycle = Stream('recycle')
@@ -381,7 +424,6 @@ def test_two_recycle_loops_with_complete_overlap():
 
 def test_two_recycle_loops_with_partial_overlap():
     f.set_flowsheet('two_recycle_loops_with_partial_overlap')
-    settings.set_thermo(['Water'], cache=True)
     feedstock = Stream('feedstock', Water=1000)
     water = Stream('water', Water=10)
     recycle = Stream('recycle')
@@ -438,7 +480,6 @@ def test_two_recycle_loops_with_partial_overlap():
 
 def test_feed_forward_recycle_loop():
     f.set_flowsheet('feed_forward_recycle_loop')
-    settings.set_thermo(['Water'], cache=True)
     feedstock = Stream('feedstock', Water=1000)
     water = Stream('water', Water=10)
     recycle = Stream('recycle')
@@ -478,7 +519,6 @@ def test_feed_forward_recycle_loop():
 
 def test_separate_recycle_loops():
     f.set_flowsheet('separate_recycle_loops')
-    settings.set_thermo(['Water'], cache=True)
     feedstock_a = Stream('feedstock_a', Water=1000)
     water_a = Stream('water_a', Water=10)
     recycle_a = Stream('recycle_a')
@@ -522,9 +562,16 @@ def test_separate_recycle_loops():
     assert recycle_loop_sys.path == (P1_a, P2_a, M1_a, S1_a, P1_b, P2_b, M1_b, S1_b)
     f.clear()
     
-def test_nested_recycle_loops():
+@pytest.mark.parametrize('converge_method, converge_options', [
+    ('Aitken', {}),
+    ('quasi-Newton', {}),
+    ('quasi-Newton', {'damping': 0.8, 'max_acceleration': 5.}),
+    ('Anderson', {}),
+    ('Anderson', {'m': 3, 'damping': 0.8}),
+])
+def test_nested_recycle_loops(monkeypatch, converge_method, converge_options):
+    monkeypatch.setattr(System, 'default_converge_method', converge_method)
     f.set_flowsheet('nested_recycle_loops')
-    settings.set_thermo(['Water'], cache=True)
     feedstock = Stream('feedstock', Water=1000)
     recycle_1, recycle_2, recycle_3, recycle_4, recycle_5 = recycles = [
         Stream('recycle_1'),
@@ -563,6 +610,8 @@ def test_nested_recycle_loops():
     S5 = Splitter('S5', S4-0, ['', recycle_1], split=0.5)
     M8 = Mixer('M8', [S3-1, S1-1, S5-0], product)
     recycle_loop_sys = f.create_system('recycle_loop_sys')
+    assert recycle_loop_sys.converge_method == converge_method.lower().replace('-', '')
+    recycle_loop_sys.converge_options[recycle_loop_sys.converge_method] = converge_options
     recycle_loop_sys.simulate()
     network = recycle_loop_sys.to_network()
     actual_network = Network(
@@ -611,69 +660,69 @@ def test_nested_recycle_loops():
 def test_sugarcane_ethanol_biorefinery_network():
     from biorefineries.sugarcane import flowsheet as f
     sugarcane_sys = f.create_system('sugarcane_sys')
-    globals().update(f.unit.data)
+    u = f.unit
     network = sugarcane_sys.to_network()
     actual_network = Network(
-        [U101,
-         U102,
-         U103,
+        [u.U101,
+         u.U102,
+         u.U103,
          Network(
-            [U201,
-             S201,
-             M201],
-            recycle=M201-0),
-         T202,
-         H201,
-         T203,
-         P201,
-         T204,
-         T205,
-         P202,
+            [u.U201,
+             u.S201,
+             u.M201],
+            recycle=u.M201-0),
+         u.T202,
+         u.H201,
+         u.T203,
+         u.P201,
+         u.T204,
+         u.T205,
+         u.P202,
          Network(
-            [M202,
-             H202,
-             T206,
-             C201,
-             C202,
-             P203],
-            recycle=P203-0),
-         S202,
-         S301,
-         F301,
-         P306,
-         M301,
-         H301,
+            [u.M202,
+             u.H202,
+             u.T206,
+             u.C201,
+             u.C202,
+             u.P203],
+            recycle=u.P203-0),
+         u.S202,
+         u.S301,
+         u.F301,
+         u.P306,
+         u.M301,
+         u.H301,
          Network(
-            [R301,
-             T301,
-             C301,
-             S302],
-            recycle=S302-0),
-         D301,
-         M302,
-         P301,
+            [u.R301,
+             u.T301,
+             u.C301,
+             u.S302],
+            recycle=u.S302-0),
+         u.D301,
+         u.M302,
+         u.P301,
          Network(
-            [H302,
-             D302,
-             P302],
-            recycle=P302-0),
+            [u.H302,
+             u.D302,
+             u.P302],
+            recycle=u.P302-0),
          Network(
-            [M303,
-             D303,
-             H303,
-             U301],
-            recycle=U301-0),
-         H304,
-         T302,
-         P304,
-         T303,
-         P305,
-         M304,
-         T304,
-         P303,
-         M305,
-         U202,
-         T305])
+            [u.M303,
+             u.D303,
+             u.H303,
+             u.U301],
+            recycle=u.U301-0),
+         u.H304,
+         u.T302,
+         u.P304,
+         u.T303,
+         u.P305,
+         u.M304,
+         u.T304,
+         u.P303,
+         u.M305,
+         u.U202,
+         u.T305])
     assert network == actual_network
     sugarcane_sys.empty_recycles()
     sugarcane_sys.simulate()
@@ -689,10 +738,12 @@ def test_corn_ethanol_biorefinery_system_creation():
     f.clear()
     
 if __name__ == '__main__':
+    settings.set_thermo(['Water'], cache=True)
     test_trivial_case()
     test_linear_case()
     test_unconnected_case()
     test_simple_recycle_loop()
+    test_quasi_newton_iter()
     test_unconnected_recycle_loop()
     test_unconnected_recycle_loops()
     test_inner_recycle_loop()
@@ -702,6 +753,8 @@ if __name__ == '__main__':
     test_two_recycle_loops_with_partial_overlap()
     test_feed_forward_recycle_loop()
     test_separate_recycle_loops()
-    test_nested_recycle_loops()
+    for converge_method in ('Aitken', 'quasi-Newton', 'Anderson'):
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            test_nested_recycle_loops(monkeypatch, converge_method, {})
     test_sugarcane_ethanol_biorefinery_network()
     test_corn_ethanol_biorefinery_system_creation()
\ No newline at end of file
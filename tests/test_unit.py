@@ -61,6 +61,20 @@ def test_unit_graphics():
     with pytest.warns(GraphicsWarning):
         assert M._graphics.get_outlet_options(M, 1) == {'tailport': 'c'}
 
+def test_solids_centrifuge_solids_loading():
+    chemicals = bst.Chemicals(['Water', 'Glucose', 'Sucrose', 'Ethanol'], cache=True)
+    bst.settings.set_thermo(chemicals)
+    chemicals.define_group('Sugars', ['Glucose', 'Sucrose'], [1, 1])
+    solids = ('Sugars', 'Ethanol')
+    feed = bst.Stream(None, Water=1000, Glucose=500, Sucrose=300, Ethanol=100, units='kg/hr')
+    other_feed = bst.Stream(None, Water=200, Glucose=2000, units='kg/hr')
+    C = bst.SolidsCentrifuge(None, ins=(feed, other_feed), 
+                             split=0.5, solids=solids)
+    C.simulate()
+    ts = sum([s.imass[solids].sum() for s in C.ins if not s.isempty()]) * 0.0011023
+    assert_allclose(C.design_results['Solids loading'], ts)
+    assert_allclose(ts, 2900 * 0.0011023)
+
 def test_equipment_lifetimes():
     from biorefineries.sugarcane import create_tea
     bst.settings.set_thermo(['Water'], cache=True)
@@ -143,4 +157,5 @@ def test_equipment_lifetimes():
 if __name__ == '__main__':
     test_unit_connections()
     test_unit_graphics()
+    test_solids_centrifuge_solids_loading()
     test_equipment_lifetimes()
\ No newline at end of file